@@ -31,6 +31,7 @@ import hashlib
 import importlib
 import importlib.util
 import multiprocessing
+import multiprocessing.connection
 import os
 import pickle
 import pwd
@@ -99,6 +100,9 @@ except Exception:
     pass
 FD_CACHE: typing.Final[int] = resource.getrlimit(resource.RLIMIT_NOFILE)[0] - 128
 PID_CACHE: typing.Final[int] = max(8192, 2*FD_CACHE)
+QUEUE_BATCH: typing.Final[int] = 10000
+# field order of the process/connection tuples sent in batches by monitor_subprocess, unpacked with dict(zip(PROC_KEYS, proc))
+PROC_KEYS: typing.Final[tuple] = ("pid", "name", "fd", "dev", "ino", "exe", "cmdline", "ppid", "pname", "pfd", "pdev", "pino", "pexe", "pcmdline", "uid", "send", "recv", "port", "ip", "domain")
 st_dev_mask = 0xffffffff
 try:
     for part in psutil.disk_partitions():
@@ -374,13 +378,41 @@ def read_snitch() -> dict:
         for key in ["Executables", "Names", "Parent Executables", "Parent Names", "SHA256"]:
             if key in snitch_record:
                 data[key] = snitch_record[key]
-    assert all(type(data[key]) == type(template[key]) for key in template), "Invalid json files"
-    assert all(key == "Set RLIMIT_NOFILE" or type(data["Config"][key]) == type(template["Config"][key]) for key in template["Config"]), "Invalid config"
+    for key in template:
+        if type(data[key]) != type(template[key]):
+            raise ValueError(f"Invalid json files, {key} should be {type(template[key]).__name__}")
+    for key in template["Config"]:
+        if key != "Set RLIMIT_NOFILE" and type(data["Config"][key]) != type(template["Config"][key]):
+            raise ValueError(f"Invalid config, {key} should be {type(template['Config'][key]).__name__}")
+    # record.json is written in insertion order, sort once here so new entries don't stay at the end of the file
+    for key in ["Executables", "Names", "Parent Executables", "Parent Names", "SHA256"]:
+        data[key] = dict(sorted(data[key].items()))
     if write_config:
         write_snitch(data, write_config=True)
     return data
 
 
+def write_json(file_path: str, data: dict, sort_keys: bool = False) -> None:
+    """write data to a temporary file then rename it over file_path so it is never left partially written, keeps the owner and mode of the original"""
+    tmp_path = file_path + ".tmp"
+    try:
+        # optional, much faster than the json module for large records, same output format
+        import orjson
+        with open(tmp_path, "wb") as json_file:
+            json_file.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | (orjson.OPT_SORT_KEYS if sort_keys else 0)))
+    except (ImportError, TypeError):
+        # TypeError (orjson.JSONEncodeError) is raised for strings orjson can't encode, such as surrogate escaped paths
+        with open(tmp_path, "w", encoding="utf-8", errors="surrogateescape") as json_file:
+            json.dump(data, json_file, indent=2, separators=(',', ': '), sort_keys=sort_keys, ensure_ascii=False)
+    try:
+        stat = os.stat(file_path)
+        os.chown(tmp_path, stat.st_uid, stat.st_gid)
+        os.chmod(tmp_path, stat.st_mode)
+    except FileNotFoundError:
+        pass
+    os.replace(tmp_path, file_path)
+
+
 def write_snitch(snitch: dict, write_config: bool = False, write_record: bool = True) -> None:
     """write the snitch dictionary to config.json, record.json, exe.log, and error.log"""
     config_path = os.path.join(BASE_PATH, "config.json")
@@ -394,8 +426,7 @@ def write_snitch(snitch: dict, write_config: bool = False, write_record: bool =
     snitch_config = snitch["Config"]
     try:
         if write_config:
-            with open(config_path, "w", encoding="utf-8", errors="surrogateescape") as json_file:
-                json.dump(snitch_config, json_file, indent=2, separators=(',', ': '), sort_keys=True, ensure_ascii=False)
+            write_json(config_path, snitch_config, sort_keys=True)
         del snitch["Config"]
         if snitch["Error Log"]:
             with open(error_log_path, "a", encoding="utf-8", errors="surrogateescape") as text_file:
@@ -406,8 +437,7 @@ def write_snitch(snitch: dict, write_config: bool = False, write_record: bool =
                 text_file.write("\n".join(snitch["Exe Log"]) + "\n")
         del snitch["Exe Log"]
         if write_record:
-            with open(record_path, "w", encoding="utf-8", errors="surrogateescape") as json_file:
-                json.dump(snitch, json_file, indent=2, separators=(',', ': '), sort_keys=True, ensure_ascii=False)
+            write_json(record_path, snitch)
     except Exception:
         NotificationManager().toast("picosnitch write error", file=sys.stderr)
     snitch["Config"] = snitch_config
@@ -415,33 +445,75 @@ def write_snitch(snitch: dict, write_config: bool = False, write_record: bool =
     snitch["Exe Log"] = []
 
 
-@functools.lru_cache(maxsize=None)
+@functools.lru_cache(maxsize=PID_CACHE)
+def join_cmdline(cmdline: str) -> str:
+    """convert a null separated /proc/pid/cmdline into a shell escaped string"""
+    return shlex.join(cmdline.encode("utf-8", "ignore").decode("utf-8", "ignore").strip("\0\t\n ").split("\0"))
+
+
+def get_ip_int(ip: str) -> typing.Tuple[int, int]:
+    """get (version, integer value) of an ip address without constructing an ipaddress object, raises ValueError if invalid"""
+    try:
+        if ":" in ip:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except OSError:
+        # fallback for forms inet_pton doesn't accept (e.g. scoped ipv6)
+        address = ipaddress.ip_address(ip)
+        return address.version, int(address)
+
+
+@functools.lru_cache(maxsize=PID_CACHE)
+def reverse_domain_name(domain: str) -> str:
+    """reverse the labels of a domain name (www.example.com -> com.example.www), return an empty string if it is an ip address"""
+    try:
+        _ = get_ip_int(domain)
+        return ""
+    except ValueError:
+        return ".".join(domain.split(".")[::-1])
+
+
+@functools.lru_cache(maxsize=PID_CACHE)
 def reverse_dns_lookup(ip: str) -> str:
     """do a reverse dns lookup, return original ip if fails"""
     try:
-        host = socket.getnameinfo((ip, 0), 0)[0]
-        try:
-            _ = ipaddress.ip_address(host)
-            return ip
-        except ValueError:
-            return ".".join(reversed(host.split(".")))
+        return reverse_domain_name(socket.getnameinfo((ip, 0), 0)[0]) or ip
     except Exception:
         return ip
 
 
+def noatime_opener(path: str, flags: int) -> int:
+    """opener for open() that avoids updating the access time of executables being hashed, if permitted"""
+    try:
+        return os.open(path, flags | os.O_NOATIME)
+    except OSError:
+        return os.open(path, flags)
+
+
+def get_sha256_file(f: typing.BinaryIO) -> str:
+    """get sha256 of an unbuffered binary file, reading in 1 MiB chunks into a reused buffer"""
+    try:
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    except Exception:
+        pass
+    sha256 = hashlib.sha256()
+    buffer = bytearray(1048576)
+    view = memoryview(buffer)
+    while size := f.readinto(buffer):
+        sha256.update(view[:size])
+    return sha256.hexdigest()
+
+
 @functools.lru_cache(maxsize=PID_CACHE)
 def get_sha256_fd(path: str, st_dev: int, st_ino: int, _mod_cnt: int) -> str:
     """get sha256 of process executable from /proc/monitor_pid/fd/proc_exe_fd"""
     try:
-        sha256 = hashlib.sha256()
-        with open(path, "rb") as f:
+        with open(path, "rb", buffering=0, opener=noatime_opener) as f:
             if not st_ino:
                 return "!!! FD Stat Error"
             if (st_dev, st_ino) != get_fstat(f.fileno()):
                 return "!!! FD Cache Error"
-            while data := f.read(1048576):
-                sha256.update(data)
-        return sha256.hexdigest()
+            return get_sha256_file(f)
     except Exception:
         return "!!! FD Read Error"
 
@@ -450,13 +522,10 @@ def get_sha256_fd(path: str, st_dev: int, st_ino: int, _mod_cnt: int) -> str:
 def get_sha256_pid(pid: int, st_dev: int, st_ino: int) -> str:
     """get sha256 of process executable from /proc/pid/exe"""
     try:
-        sha256 = hashlib.sha256()
-        with open(f"/proc/{pid}/exe", "rb") as f:
+        with open(f"/proc/{pid}/exe", "rb", buffering=0, opener=noatime_opener) as f:
             if (st_dev, st_ino) != get_fstat(f.fileno()):
                 return "!!! PID Recycled Error"
-            while data := f.read(1048576):
-                sha256.update(data)
-        return sha256.hexdigest()
+            return get_sha256_file(f)
     except Exception:
         return "!!! PID Read Error"
 
@@ -464,7 +533,7 @@ def get_sha256_pid(pid: int, st_dev: int, st_ino: int) -> str:
 @functools.lru_cache(maxsize=PID_CACHE)
 def get_sha256_fuse(q_in: multiprocessing.Queue, q_out: multiprocessing.Queue, path: str, pid: int, st_dev: int, st_ino: int, _mod_cnt: int) -> str:
     """get sha256 of process executable from a fuse mount"""
-    q_in.put(pickle.dumps((path, pid, st_dev, st_ino)))
+    q_in.put((path, pid, st_dev, st_ino))
     try:
         return q_out.get()
     except Exception:
@@ -510,34 +579,54 @@ def get_vt_results(snitch: dict, q_vt: multiprocessing.Queue, q_out: multiproces
                     else:
                         name = exe
                     proc = {"exe": exe, "name": name}
-                    q_vt.put(pickle.dumps((proc, sha256)))
+                    q_vt.put((proc, sha256))
     else:
-        while not q_vt.empty():
-            proc, sha256, result, suspicious = pickle.loads(q_vt.get())
-            q_out.put(pickle.dumps({"type": "vt_result", "name": proc["name"], "exe": proc["exe"], "sha256": sha256, "result": result, "suspicious": suspicious}))
+        try:
+            for i in range(QUEUE_BATCH):
+                proc, sha256, result, suspicious = q_vt.get_nowait()
+                q_out.put({"type": "vt_result", "name": proc["name"], "exe": proc["exe"], "sha256": sha256, "result": result, "suspicious": suspicious})
+        except queue.Empty:
+            pass
+
+
+def get_proc_status(pid: int) -> dict:
+    """get name, ppid, and real uid of a process from /proc/pid/status, raises if the process is gone"""
+    proc = {"pid": pid}
+    with open(f"/proc/{pid}/status", "r", encoding="utf-8", errors="surrogateescape") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key == "Name":
+                proc["name"] = value.strip("\t\n")
+            elif key == "PPid":
+                proc["ppid"] = int(value)
+            elif key == "Uid":
+                proc["uid"] = int(value.split()[0])
+                break
+    return proc
 
 
 def monitor_subprocess_initial_poll() -> list:
-    """poll initial processes and connections using psutil"""
+    """poll initial processes and connections, reading each process from /proc once and using psutil only to list connections"""
+    proc_status = {}
+    def get_initial_proc(pid: int, ip: str, port: int) -> dict:
+        if pid not in proc_status:
+            proc_status[pid] = get_proc_status(pid)
+        proc = dict(proc_status[pid])
+        if proc["ppid"] not in proc_status:
+            proc_status[proc["ppid"]] = get_proc_status(proc["ppid"])
+        proc["pname"] = proc_status[proc["ppid"]]["name"]
+        proc["ip"] = ip
+        proc["port"] = port
+        return proc
     initial_processes = []
     for pid in psutil.pids():
         try:
-            proc = psutil.Process(pid).as_dict(attrs=["name", "exe", "pid", "ppid", "uids"], ad_value="")
-            proc["uid"] = proc["uids"][0]
-            proc["pname"] = psutil.Process(proc["ppid"]).name()
-            proc["ip"] = ""
-            proc["port"] = -1
-            initial_processes.append(proc)
+            initial_processes.append(get_initial_proc(pid, "", -1))
         except Exception:
             pass
     for conn in psutil.net_connections(kind="all"):
         try:
-            proc = psutil.Process(conn.pid).as_dict(attrs=["name", "exe", "pid", "ppid", "uids"], ad_value="")
-            proc["uid"] = proc["uids"][0]
-            proc["pname"] = psutil.Process(proc["ppid"]).name()
-            proc["ip"] = conn.raddr.ip
-            proc["port"] = conn.raddr.port
-            initial_processes.append(proc)
+            initial_processes.append(get_initial_proc(conn.pid, conn.raddr.ip, conn.raddr.port))
         except Exception:
             pass
     return initial_processes
@@ -572,15 +661,15 @@ def secondary_subprocess_sha_wrapper(snitch: dict, fan_mod_cnt: dict, proc: dict
     if proc["exe"] in snitch["SHA256"]:
         if sha256 not in snitch["SHA256"][proc["exe"]]:
             snitch["SHA256"][proc["exe"]][sha256] = "SUBMITTED"
-            q_vt.put(pickle.dumps((proc, sha256)))
-            q_out.put(pickle.dumps({"type": "sha256", "name": proc["name"], "exe": proc["exe"], "sha256": sha256}))
+            q_vt.put((proc, sha256))
+            q_out.put({"type": "sha256", "name": proc["name"], "exe": proc["exe"], "sha256": sha256})
         elif snitch["SHA256"][proc["exe"]][sha256] == "Failed to read process for upload":
             snitch["SHA256"][proc["exe"]][sha256] = "RETRY"
-            q_vt.put(pickle.dumps((proc, sha256)))
+            q_vt.put((proc, sha256))
     else:
         snitch["SHA256"][proc["exe"]] = {sha256: "SUBMITTED"}
-        q_vt.put(pickle.dumps((proc, sha256)))
-        q_out.put(pickle.dumps({"type": "sha256", "name": proc["name"], "exe": proc["exe"], "sha256": sha256}))
+        q_vt.put((proc, sha256))
+        q_out.put({"type": "sha256", "name": proc["name"], "exe": proc["exe"], "sha256": sha256})
     return sha256
 
 
@@ -588,20 +677,35 @@ def secondary_subprocess_helper(snitch: dict, fan_mod_cnt: dict, new_processes:
     """iterate over the list of process/connection data to generate a list of entries for the sql database"""
     datetime_now = time.strftime("%Y-%m-%d %H:%M:%S")
     event_counter = collections.defaultdict(int)
-    traffic_counter = collections.defaultdict(int)
+    send_counter = collections.defaultdict(int)
+    recv_counter = collections.defaultdict(int)
     transaction = set()
-    for proc in new_processes:
-        proc = pickle.loads(proc)
-        if type(proc) != dict:
-            q_error.put("sync error between secondary and primary, received '%s' in middle of transfer" % str(proc))
+    # collapse repeated events (same process, parent, and address) into [conns, send, recv] so each is only hashed, resolved, and filtered once
+    unique_procs = collections.defaultdict(lambda: [0, 0, 0])
+    send_i, recv_i = PROC_KEYS.index("send"), PROC_KEYS.index("recv")
+    for batch in new_processes:
+        batch = pickle.loads(batch)
+        if type(batch) != list:
+            q_error.put("sync error between secondary and primary, received '%s' in middle of transfer" % str(batch))
             continue
+        for proc in batch:
+            if type(proc) != tuple or len(proc) != len(PROC_KEYS):
+                q_error.put("sync error between secondary and primary, received '%s' in middle of transfer" % str(proc))
+                continue
+            counts = unique_procs[proc[:send_i] + (0, 0) + proc[recv_i+1:]]
+            if not (proc[send_i] or proc[recv_i]):
+                counts[0] += 1
+            counts[1] += proc[send_i]
+            counts[2] += proc[recv_i]
+    for proc, (conns, send, recv) in unique_procs.items():
+        proc = dict(zip(PROC_KEYS, proc))
         sha256 = secondary_subprocess_sha_wrapper(snitch, fan_mod_cnt, proc, p_rfuse, q_vt, q_out, q_error)
         pproc = {"pid": proc["ppid"], "name": proc["pname"], "exe": proc["pexe"], "fd": proc["pfd"], "dev": proc["pdev"], "ino": proc["pino"]}
         psha256 = secondary_subprocess_sha_wrapper(snitch, fan_mod_cnt, pproc, p_rfuse, q_vt, q_out, q_error)
         # join or omit commands from logs
         if snitch["Config"]["Log commands"]:
-            proc["cmdline"] = shlex.join(proc["cmdline"].encode("utf-8", "ignore").decode("utf-8", "ignore").strip("\0\t\n ").split("\0"))
-            proc["pcmdline"] = shlex.join(proc["pcmdline"].encode("utf-8", "ignore").decode("utf-8", "ignore").strip("\0\t\n ").split("\0"))
+            proc["cmdline"] = join_cmdline(proc["cmdline"])
+            proc["pcmdline"] = join_cmdline(proc["pcmdline"])
         else:
             proc["cmdline"] = ""
             proc["pcmdline"] = ""
@@ -612,56 +716,58 @@ def secondary_subprocess_helper(snitch: dict, fan_mod_cnt: dict, new_processes:
         else:
             proc["domain"], proc["ip"] = "", ""
         # omit entry from logs
-        ignored = False
-        for ignore in snitch["Config"]["Log ignore"]:
-            if ((proc["port"] == ignore) or
-                (sha256 == ignore) or
-                (type(ignore) == str and proc["domain"].startswith(ignore))
-               ):
-                ignored = True
-                break
-        if ignored:
+        if ((proc["port"] in snitch["Config"]["Log ignore"]) or
+            (sha256 in snitch["Config"]["Log ignore"]) or
+            (proc["domain"].startswith(snitch["Config"]["Log ignore domain"]))
+           ):
             continue
         if snitch["Config"]["Log ignore IP"] and proc["ip"]:
-            daddr = ipaddress.ip_address(proc["ip"])
-            if (any(daddr in network for network in snitch["Config"]["Log ignore IP"])):
+            version, daddr = get_ip_int(proc["ip"])
+            if any(version == net_version and daddr & netmask == network for net_version, network, netmask in snitch["Config"]["Log ignore IP"]):
                 continue
         # create sql entry
         event = (proc["exe"], proc["name"], proc["cmdline"], sha256, datetime_now, proc["domain"], proc["ip"], proc["port"], proc["uid"], proc["pexe"], proc["pname"], proc["pcmdline"], psha256)
-        if not (proc["send"] or proc["recv"]):
-            event_counter[str(event)] += 1
-        traffic_counter["send " + str(event)] += proc["send"]
-        traffic_counter["recv " + str(event)] += proc["recv"]
+        event_counter[event] += conns
+        send_counter[event] += send
+        recv_counter[event] += recv
         transaction.add(event)
-    return [(*event, event_counter[str(event)], traffic_counter["send " + str(event)], traffic_counter["recv " + str(event)]) for event in transaction]
+    return [(*event, event_counter[event], send_counter[event], recv_counter[event]) for event in transaction]
 
 
-def primary_subprocess_helper(snitch: dict, new_processes: typing.List[bytes]) -> None:
-    """iterate over the list of process/connection data to update the snitch dictionary and create notifications on new entries"""
+def primary_subprocess_helper(snitch: dict, known_pairs: set, new_processes: typing.List[bytes]) -> bool:
+    """iterate over the list of process/connection data to update the snitch dictionary and create notifications on new entries, return True if the record was modified"""
     datetime_now = time.strftime("%Y-%m-%d %H:%M:%S")
-    for proc in new_processes:
-        proc = pickle.loads(proc)
+    modified = False
+    for proc in (proc for batch in new_processes for proc in pickle.loads(batch)):
+        proc = dict(zip(PROC_KEYS, proc))
         proc_name, proc_exe, snitch_names, snitch_executables, parent = proc["name"], proc["exe"], snitch["Names"], snitch["Executables"], ""
         for i in range(2):
-            notification = []
-            if proc_name in snitch_names:
-                if proc_exe not in snitch_names[proc_name]:
-                    snitch_names[proc_name].append(proc_exe)
-            else:
-                snitch_names[proc_name] = [proc_exe]
-                notification.append("name")
-            if proc_exe in snitch_executables:
-                if proc_name not in snitch_executables[proc_exe]:
-                    snitch_executables[proc_exe].append(proc_name)
-            else:
-                snitch_executables[proc_exe] = [proc_name]
-                notification.append("exe")
-                if proc_exe not in snitch["SHA256"]:
-                    snitch["SHA256"][proc_exe] = {}
-            if notification:
-                snitch["Exe Log"].append(f"{datetime_now} {proc_name:<16.16} {proc_exe} (new {', '.join(notification)}){parent}")
-                NotificationManager().toast(f"picosnitch: {proc_name} {proc_exe}")
+            # skip the list lookups below for (name, exe) pairs already in the record
+            if (parent, proc_name, proc_exe) not in known_pairs:
+                known_pairs.add((parent, proc_name, proc_exe))
+                notification = []
+                if proc_name in snitch_names:
+                    if proc_exe not in snitch_names[proc_name]:
+                        snitch_names[proc_name].append(proc_exe)
+                        modified = True
+                else:
+                    snitch_names[proc_name] = [proc_exe]
+                    notification.append("name")
+                if proc_exe in snitch_executables:
+                    if proc_name not in snitch_executables[proc_exe]:
+                        snitch_executables[proc_exe].append(proc_name)
+                        modified = True
+                else:
+                    snitch_executables[proc_exe] = [proc_name]
+                    notification.append("exe")
+                    if proc_exe not in snitch["SHA256"]:
+                        snitch["SHA256"][proc_exe] = {}
+                if notification:
+                    modified = True
+                    snitch["Exe Log"].append(f"{datetime_now} {proc_name:<16.16} {proc_exe} (new {', '.join(notification)}){parent}")
+                    NotificationManager().toast(f"picosnitch: {proc_name} {proc_exe}")
             proc_name, proc_exe, snitch_names, snitch_executables, parent = proc["pname"], proc["pexe"], snitch["Parent Names"], snitch["Parent Executables"], " (parent)"
+    return modified
 
 
 ### processes
@@ -670,19 +776,27 @@ def primary_subprocess(snitch, snitch_pipes, secondary_pipe, q_error, q_in, _q_o
     os.nice(-20)
     # init variables for loop
     parent_process = multiprocessing.parent_process()
-    snitch_record = pickle.dumps([snitch["Executables"], snitch["Names"], snitch["Parent Executables"], snitch["Parent Names"], snitch["SHA256"]])
     last_write = 0
     write_record = False
     processes_to_send = []
+    known_pairs = set()
+    for names_key, executables_key, parent in [("Names", "Executables", ""), ("Parent Names", "Parent Executables", " (parent)")]:
+        for name, exes in snitch[names_key].items():
+            for exe in exes:
+                if name in snitch[executables_key].get(exe, []):
+                    known_pairs.add((parent, name, exe))
     # init notifications
     if snitch["Config"]["Desktop notifications"]:
         NotificationManager().enable_notifications()
     # init signal handlers
     def write_snitch_and_exit(snitch: dict, q_error: multiprocessing.Queue, snitch_pipes):
-        while not q_error.empty():
-            error = q_error.get()
-            snitch["Error Log"].append(time.strftime("%Y-%m-%d %H:%M:%S") + " " + error)
-            NotificationManager().toast(error, file=sys.stderr)
+        try:
+            while True:
+                error = q_error.get_nowait()
+                snitch["Error Log"].append(time.strftime("%Y-%m-%d %H:%M:%S") + " " + error)
+                NotificationManager().toast(error, file=sys.stderr)
+        except queue.Empty:
+            pass
         write_snitch(snitch)
         for snitch_pipe in snitch_pipes:
             snitch_pipe.close()
@@ -695,11 +809,8 @@ def primary_subprocess(snitch, snitch_pipes, secondary_pipe, q_error, q_in, _q_o
             listen.wait()
             new_processes = pipe_data[0]
             while listen.is_set():
-                for i in range(5):
-                    if any(snitch_pipe.poll() for snitch_pipe in snitch_pipes):
-                        break
-                    time.sleep(1)
-                for snitch_pipe in snitch_pipes:
+                # block until the monitor sends something (or timeout to check listen) instead of polling with sleep
+                for snitch_pipe in multiprocessing.connection.wait(snitch_pipes, timeout=5):
                     while snitch_pipe.poll():
                         new_processes.append(snitch_pipe.recv_bytes())
             ready.set()
@@ -715,10 +826,13 @@ def primary_subprocess(snitch, snitch_pipes, secondary_pipe, q_error, q_in, _q_o
             write_snitch_and_exit(snitch, q_error, snitch_pipes)
         try:
             # check for errors
-            while not q_error.empty():
-                error = q_error.get()
-                snitch["Error Log"].append(time.strftime("%Y-%m-%d %H:%M:%S") + " " + error)
-                NotificationManager().toast(error, file=sys.stderr)
+            try:
+                for i in range(QUEUE_BATCH):
+                    error = q_error.get_nowait()
+                    snitch["Error Log"].append(time.strftime("%Y-%m-%d %H:%M:%S") + " " + error)
+                    NotificationManager().toast(error, file=sys.stderr)
+            except queue.Empty:
+                pass
             # get list of new processes and connections since last update
             listen.clear()
             if not ready.wait(timeout=300):
@@ -729,42 +843,44 @@ def primary_subprocess(snitch, snitch_pipes, secondary_pipe, q_error, q_in, _q_o
             ready.clear()
             listen.set()
             # process the list and update snitch, send new process/connection data to secondary subprocess if ready
-            primary_subprocess_helper(snitch, new_processes)
+            if primary_subprocess_helper(snitch, known_pairs, new_processes):
+                write_record = True
             processes_to_send += new_processes
-            while not q_in.empty():
-                msg: dict = pickle.loads(q_in.get())
-                if msg["type"] == "ready":
-                    secondary_pipe.send_bytes(pickle.dumps(len(processes_to_send)))
-                    for proc in processes_to_send:
-                        secondary_pipe.send_bytes(proc)
-                    secondary_pipe.send_bytes(pickle.dumps("done"))
-                    processes_to_send = []
-                    break
-                elif msg["type"] == "sha256":
-                    if msg["exe"] in snitch["SHA256"]:
-                        if msg["sha256"] not in snitch["SHA256"][msg["exe"]]:
-                            snitch["SHA256"][msg["exe"]][msg["sha256"]] = "VT Pending"
-                            snitch["Exe Log"].append(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {msg['sha256']:<16.16} {msg['exe']} (new hash)")
-                            NotificationManager().toast(f"New sha256: {msg['exe']}")
-                    else:
-                        snitch["SHA256"][msg["exe"]] = {msg["sha256"]: "VT Pending"}
-                elif msg["type"] == "vt_result":
-                    if msg["exe"] in snitch["SHA256"]:
-                        if msg["sha256"] not in snitch["SHA256"][msg["exe"]]:
-                            snitch["Exe Log"].append(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {msg['sha256']:<16.16} {msg['exe']} (new hash)")
-                            NotificationManager().toast(f"New sha256: {msg['exe']}")
-                        snitch["SHA256"][msg["exe"]][msg["sha256"]] = msg["result"]
-                    else:
-                        snitch["SHA256"][msg["exe"]] = {msg["sha256"]: msg["result"]}
-                    if msg["suspicious"]:
-                        snitch["Exe Log"].append(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {msg['sha256']:<16.16} {msg['exe']} (suspicious)")
-                        NotificationManager().toast(f"Suspicious VT results: {msg['exe']}")
+            try:
+                for i in range(QUEUE_BATCH):
+                    msg: dict = q_in.get_nowait()
+                    if msg["type"] == "ready":
+                        secondary_pipe.send_bytes(pickle.dumps(len(processes_to_send)))
+                        for proc in processes_to_send:
+                            secondary_pipe.send_bytes(proc)
+                        secondary_pipe.send_bytes(pickle.dumps("done"))
+                        processes_to_send = []
+                        break
+                    elif msg["type"] == "sha256":
+                        write_record = True
+                        if msg["exe"] in snitch["SHA256"]:
+                            if msg["sha256"] not in snitch["SHA256"][msg["exe"]]:
+                                snitch["SHA256"][msg["exe"]][msg["sha256"]] = "VT Pending"
+                                snitch["Exe Log"].append(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {msg['sha256']:<16.16} {msg['exe']} (new hash)")
+                                NotificationManager().toast(f"New sha256: {msg['exe']}")
+                        else:
+                            snitch["SHA256"][msg["exe"]] = {msg["sha256"]: "VT Pending"}
+                    elif msg["type"] == "vt_result":
+                        write_record = True
+                        if msg["exe"] in snitch["SHA256"]:
+                            if msg["sha256"] not in snitch["SHA256"][msg["exe"]]:
+                                snitch["Exe Log"].append(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {msg['sha256']:<16.16} {msg['exe']} (new hash)")
+                                NotificationManager().toast(f"New sha256: {msg['exe']}")
+                            snitch["SHA256"][msg["exe"]][msg["sha256"]] = msg["result"]
+                        else:
+                            snitch["SHA256"][msg["exe"]] = {msg["sha256"]: msg["result"]}
+                        if msg["suspicious"]:
+                            snitch["Exe Log"].append(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {msg['sha256']:<16.16} {msg['exe']} (suspicious)")
+                            NotificationManager().toast(f"Suspicious VT results: {msg['exe']}")
+            except queue.Empty:
+                pass
             # write the snitch dictionary to record.json, error.log, and exe.log (limit writes to reduce disk wear)
             if snitch["Error Log"] or snitch["Exe Log"] or time.time() - last_write > 30:
-                new_record = pickle.dumps([snitch["Executables"], snitch["Names"], snitch["Parent Executables"], snitch["Parent Names"], snitch["SHA256"]])
-                if new_record != snitch_record:
-                    snitch_record = new_record
-                    write_record = True
                 write_snitch(snitch, write_record=write_record)
                 last_write = time.time()
                 write_record = False
@@ -803,15 +919,22 @@ def secondary_subprocess(snitch, fan_fd, p_rfuse: ProcessManager, p_virustotal:
     ignored_ips = []
     for ip_subnet in reversed(snitch["Config"]["Log ignore"]):
         try:
-            ignored_ips.append(ipaddress.ip_network(ip_subnet))
+            network = ipaddress.ip_network(ip_subnet)
+            ignored_ips.append((network.version, int(network.network_address), int(network.netmask)))
             snitch["Config"]["Log ignore"].remove(ip_subnet)
         except Exception as e:
             pass
     snitch["Config"]["Log ignore IP"] = ignored_ips
+    # convert remaining entries (ports and sha256) to a set for constant time lookups, and strings to a tuple of domain prefixes for str.startswith
+    snitch["Config"]["Log ignore domain"] = tuple(ignore for ignore in snitch["Config"]["Log ignore"] if type(ignore) == str)
+    snitch["Config"]["Log ignore"] = frozenset(ignore for ignore in snitch["Config"]["Log ignore"] if type(ignore) not in (list, dict))
     # main loop
     transaction = []
     new_processes = []
     last_write = 0
+    # compare the raw bytes of the last message to the "done" marker rather than unpickling it
+    done_pickle = pickle.dumps("done")
+    last_dns_flush = time.time()
     while True:
         if not parent_process.is_alive():
             return 0
@@ -820,7 +943,7 @@ def secondary_subprocess(snitch, fan_fd, p_rfuse: ProcessManager, p_virustotal:
             if secondary_pipe.poll():
                 q_error.put("sync error between secondary and primary on ready (pipe not empty)")
             else:
-                q_primary_in.put(pickle.dumps({"type": "ready"}))
+                q_primary_in.put({"type": "ready"})
                 secondary_pipe.poll(timeout=300)
                 if not secondary_pipe.poll():
                     q_error.put("sync error between secondary and primary on ready (secondary timed out waiting for first message)")
@@ -828,9 +951,10 @@ def secondary_subprocess(snitch, fan_fd, p_rfuse: ProcessManager, p_virustotal:
             transfer_size = 0
             if secondary_pipe.poll():
                 first_pickle = secondary_pipe.recv_bytes()
-                if type(pickle.loads(first_pickle)) == int:
-                    transfer_size = pickle.loads(first_pickle)
-                elif pickle.loads(first_pickle) == "done":
+                first_message = pickle.loads(first_pickle)
+                if type(first_message) == int:
+                    transfer_size = first_message
+                elif first_message == "done":
                     q_error.put("sync error between secondary and primary on ready (received done)")
                 else:
                     q_error.put("sync error between secondary and primary on ready (did not receive transfer size)")
@@ -842,7 +966,7 @@ def secondary_subprocess(snitch, fan_fd, p_rfuse: ProcessManager, p_virustotal:
                     new_processes.append(secondary_pipe.recv_bytes())
                     transfer_size -= 1
                 timeout_counter += 1
-                if pickle.loads(new_processes[-1]) == "done":
+                if new_processes[-1] == done_pickle:
                     _ = new_processes.pop()
                     transfer_size += 1
                     break
@@ -855,6 +979,10 @@ def secondary_subprocess(snitch, fan_fd, p_rfuse: ProcessManager, p_virustotal:
             # check for other pending data (vt, fanotify)
             get_vt_results(snitch, p_virustotal.q_out, q_primary_in, False)
             get_fanotify_events(fan_fd, fan_mod_cnt, q_error)
+            # flush cached reverse dns lookups so stale hostnames don't persist for the lifetime of the daemon
+            if time.time() - last_dns_flush > 3600:
+                reverse_dns_lookup.cache_clear()
+                last_dns_flush = time.time()
             # process connection data
             if time.time() - last_write > snitch["Config"]["DB write limit (seconds)"] and (transaction or new_processes):
                 current_write = time.time()
@@ -910,7 +1038,7 @@ def rfuse_subprocess(config: dict, q_error, q_in, q_out):
         if not parent_process.is_alive():
             return 0
         try:
-            path, pid, st_dev, st_ino = pickle.loads(q_in.get(block=True, timeout=15))
+            path, pid, st_dev, st_ino = q_in.get(block=True, timeout=15)
             sha256 = get_sha256_fd.__wrapped__(path, st_dev, st_ino, 0)
             if sha256.startswith("!"):
                 sha256 = get_sha256_pid.__wrapped__(pid, st_dev, st_ino)
@@ -931,7 +1059,13 @@ def monitor_subprocess(config: dict, fan_fd, snitch_pipes, q_error, q_in, _q_out
     from bcc import BPF
     parent_process = multiprocessing.parent_process()
     signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
-    snitch_pipe_0, snitch_pipe_1, snitch_pipe_2, snitch_pipe_3, snitch_pipe_4, snitch_pipe_5, snitch_pipe_6, snitch_pipe_7 = snitch_pipes
+    # events are collected per pipe while bpf callbacks run and sent as one message per pipe after each poll
+    event_batches = [[] for snitch_pipe in snitch_pipes]
+    def send_event_batches():
+        for snitch_pipe, event_batch in zip(snitch_pipes, event_batches):
+            if event_batch:
+                snitch_pipe.send_bytes(pickle.dumps(event_batch))
+                event_batch.clear()
     EVERY_EXE: typing.Final[bool] = config["Every exe (not just conns)"]
     PAGE_CNT: typing.Final[int] = config["Perf ring buffer (pages)"]
     libc = ctypes.CDLL(ctypes.util.find_library("c"))
@@ -940,7 +1074,8 @@ def monitor_subprocess(config: dict, fan_fd, snitch_pipes, q_error, q_in, _q_out
     _FAN_MARK_FLUSH = 0x80
     _FAN_MODIFY = 0x2
     libc.fanotify_mark(fan_fd, _FAN_MARK_FLUSH, _FAN_MODIFY, -1, None)
-    domain_dict = collections.defaultdict(str)
+    # ip -> reversed domain from getaddrinfo, oldest entries are evicted so this doesn't grow for the lifetime of the monitor
+    domain_dict = collections.OrderedDict()
     fd_dict = collections.OrderedDict()
     for x in range(FD_CACHE):
         fd_dict[f"tmp{x}"] = (0,)
@@ -994,11 +1129,12 @@ def monitor_subprocess(config: dict, fan_fd, snitch_pipes, q_error, q_in, _q_out
             st_dev, st_ino, pid, fd, exe, cmd = get_fd(stat.st_dev, stat.st_ino, proc["pid"], proc["port"])
             pst_dev, pst_ino, ppid, pfd, pexe, pcmd = get_fd(pstat.st_dev, pstat.st_ino, proc["ppid"], -1)
             if EVERY_EXE or proc["port"] != -1:
-                snitch_pipe_0.send_bytes(pickle.dumps({"pid": pid, "name": proc["name"], "fd": fd, "dev": st_dev, "ino": st_ino, "exe": exe, "cmdline": cmd,
-                                                     "ppid": ppid, "pname": proc["pname"], "pfd": pfd, "pdev": pst_dev, "pino": pst_ino, "pexe": pexe, "pcmdline": pcmd,
-                                                     "uid": proc["uid"], "send": 0, "recv": 0, "port": proc["port"], "ip": proc["ip"], "domain": domain_dict[proc["ip"]]}))
+                event_batches[0].append((pid, proc["name"], fd, st_dev, st_ino, exe, cmd,
+                                       ppid, proc["pname"], pfd, pst_dev, pst_ino, pexe, pcmd,
+                                       proc["uid"], 0, 0, proc["port"], proc["ip"], domain_dict.get(proc["ip"], "")))
         except Exception:
             pass
+    send_event_batches()
     # run bpf program
     bpf_text = bpf_text_base
     if config["Bandwidth monitor"]:
@@ -1034,75 +1170,75 @@ def monitor_subprocess(config: dict, fan_fd, snitch_pipes, q_error, q_in, _q_out
         st_dev, st_ino, pid, fd, exe, cmd = get_fd(event.dev, event.ino, event.pid, event.dport)
         pst_dev, pst_ino, ppid, pfd, pexe, pcmd = get_fd(event.pdev, event.pino, event.ppid, -1)
         ip = socket.inet_ntop(socket.AF_INET, struct.pack("I", event.daddr))
-        snitch_pipe_0.send_bytes(pickle.dumps({"pid": pid, "name": event.comm.decode(), "fd": fd, "dev": st_dev, "ino": st_ino, "exe": exe, "cmdline": cmd,
-                                             "ppid": ppid, "pname": event.pcomm.decode(), "pfd": pfd, "pdev": pst_dev, "pino": pst_ino, "pexe": pexe, "pcmdline": pcmd,
-                                             "uid": event.uid, "send": 0, "recv": 0, "port": event.dport, "ip": ip, "domain": domain_dict[ip]}))
+        event_batches[0].append((pid, event.comm.decode(), fd, st_dev, st_ino, exe, cmd,
+                               ppid, event.pcomm.decode(), pfd, pst_dev, pst_ino, pexe, pcmd,
+                               event.uid, 0, 0, event.dport, ip, domain_dict.get(ip, "")))
     def queue_ipv6_event(cpu, data, size):
         event = b["ipv6_events"].event(data)
         st_dev, st_ino, pid, fd, exe, cmd = get_fd(event.dev, event.ino, event.pid, event.dport)
         pst_dev, pst_ino, ppid, pfd, pexe, pcmd = get_fd(event.pdev, event.pino, event.ppid, -1)
         ip = socket.inet_ntop(socket.AF_INET6, event.daddr)
-        snitch_pipe_1.send_bytes(pickle.dumps({"pid": pid, "name": event.comm.decode(), "fd": fd, "dev": st_dev, "ino": st_ino, "exe": exe, "cmdline": cmd,
-                                             "ppid": ppid, "pname": event.pcomm.decode(), "pfd": pfd, "pdev": pst_dev, "pino": pst_ino, "pexe": pexe, "pcmdline": pcmd,
-                                             "uid": event.uid, "send": 0, "recv": 0, "port": event.dport, "ip": ip, "domain": domain_dict[ip]}))
+        event_batches[1].append((pid, event.comm.decode(), fd, st_dev, st_ino, exe, cmd,
+                               ppid, event.pcomm.decode(), pfd, pst_dev, pst_ino, pexe, pcmd,
+                               event.uid, 0, 0, event.dport, ip, domain_dict.get(ip, "")))
     def queue_other_event(cpu, data, size):
         event = b["other_socket_events"].event(data)
         st_dev, st_ino, pid, fd, exe, cmd = get_fd(event.dev, event.ino, event.pid, 0)
         pst_dev, pst_ino, ppid, pfd, pexe, pcmd = get_fd(event.pdev, event.pino, event.ppid, -1)
-        snitch_pipe_2.send_bytes(pickle.dumps({"pid": pid, "name": event.comm.decode(), "fd": fd, "dev": st_dev, "ino": st_ino, "exe": exe, "cmdline": cmd,
-                                             "ppid": ppid, "pname": event.pcomm.decode(), "pfd": pfd, "pdev": pst_dev, "pino": pst_ino, "pexe": pexe, "pcmdline": pcmd,
-                                             "uid": event.uid, "send": 0, "recv": 0, "port": 0, "ip": "", "domain": ""}))
+        event_batches[2].append((pid, event.comm.decode(), fd, st_dev, st_ino, exe, cmd,
+                               ppid, event.pcomm.decode(), pfd, pst_dev, pst_ino, pexe, pcmd,
+                               event.uid, 0, 0, 0, "", ""))
     def queue_sendv4_event(cpu, data, size):
         event = b["sendmsg_events"].event(data)
         st_dev, st_ino, pid, fd, exe, cmd = get_fd(event.dev, event.ino, event.pid, event.dport)
         pst_dev, pst_ino, ppid, pfd, pexe, pcmd = get_fd(event.pdev, event.pino, event.ppid, -1)
         ip =socket.inet_ntop(socket.AF_INET, struct.pack("I", event.daddr))
-        snitch_pipe_3.send_bytes(pickle.dumps({"pid": pid, "name": event.comm.decode(), "fd": fd, "dev": st_dev, "ino": st_ino, "exe": exe, "cmdline": cmd,
-                                             "ppid": ppid, "pname": event.pcomm.decode(), "pfd": pfd, "pdev": pst_dev, "pino": pst_ino, "pexe": pexe, "pcmdline": pcmd,
-                                             "uid": event.uid, "send": event.bytes, "recv": 0, "port": event.dport, "ip": ip, "domain": domain_dict[ip]}))
+        event_batches[3].append((pid, event.comm.decode(), fd, st_dev, st_ino, exe, cmd,
+                               ppid, event.pcomm.decode(), pfd, pst_dev, pst_ino, pexe, pcmd,
+                               event.uid, event.bytes, 0, event.dport, ip, domain_dict.get(ip, "")))
     def queue_sendv6_event(cpu, data, size):
         event = b["sendmsg6_events"].event(data)
         st_dev, st_ino, pid, fd, exe, cmd = get_fd(event.dev, event.ino, event.pid, event.dport)
         pst_dev, pst_ino, ppid, pfd, pexe, pcmd = get_fd(event.pdev, event.pino, event.ppid, -1)
         ip = socket.inet_ntop(socket.AF_INET6, event.daddr)
-        snitch_pipe_4.send_bytes(pickle.dumps({"pid": pid, "name": event.comm.decode(), "fd": fd, "dev": st_dev, "ino": st_ino, "exe": exe, "cmdline": cmd,
-                                             "ppid": ppid, "pname": event.pcomm.decode(), "pfd": pfd, "pdev": pst_dev, "pino": pst_ino, "pexe": pexe, "pcmdline": pcmd,
-                                             "uid": event.uid, "send": event.bytes, "recv": 0, "port": event.dport, "ip": ip, "domain": domain_dict[ip]}))
+        event_batches[4].append((pid, event.comm.decode(), fd, st_dev, st_ino, exe, cmd,
+                               ppid, event.pcomm.decode(), pfd, pst_dev, pst_ino, pexe, pcmd,
+                               event.uid, event.bytes, 0, event.dport, ip, domain_dict.get(ip, "")))
     def queue_recvv4_event(cpu, data, size):
         event = b["recvmsg_events"].event(data)
         st_dev, st_ino, pid, fd, exe, cmd = get_fd(event.dev, event.ino, event.pid, event.dport)
         pst_dev, pst_ino, ppid, pfd, pexe, pcmd = get_fd(event.pdev, event.pino, event.ppid, -1)
         ip = socket.inet_ntop(socket.AF_INET, struct.pack("I", event.daddr))
-        snitch_pipe_5.send_bytes(pickle.dumps({"pid": pid, "name": event.comm.decode(), "fd": fd, "dev": st_dev, "ino": st_ino, "exe": exe, "cmdline": cmd,
-                                             "ppid": ppid, "pname": event.pcomm.decode(), "pfd": pfd, "pdev": pst_dev, "pino": pst_ino, "pexe": pexe, "pcmdline": pcmd,
-                                             "uid": event.uid, "send": 0, "recv": event.bytes, "port": event.dport, "ip": ip, "domain": domain_dict[ip]}))
+        event_batches[5].append((pid, event.comm.decode(), fd, st_dev, st_ino, exe, cmd,
+                               ppid, event.pcomm.decode(), pfd, pst_dev, pst_ino, pexe, pcmd,
+                               event.uid, 0, event.bytes, event.dport, ip, domain_dict.get(ip, "")))
     def queue_recvv6_event(cpu, data, size):
         event = b["recvmsg6_events"].event(data)
         st_dev, st_ino, pid, fd, exe, cmd = get_fd(event.dev, event.ino, event.pid, event.dport)
         pst_dev, pst_ino, ppid, pfd, pexe, pcmd = get_fd(event.pdev, event.pino, event.ppid, -1)
         ip = socket.inet_ntop(socket.AF_INET6, event.daddr)
-        snitch_pipe_6.send_bytes(pickle.dumps({"pid": pid, "name": event.comm.decode(), "fd": fd, "dev": st_dev, "ino": st_ino, "exe": exe, "cmdline": cmd,
-                                             "ppid": ppid, "pname": event.pcomm.decode(), "pfd": pfd, "pdev": pst_dev, "pino": pst_ino, "pexe": pexe, "pcmdline": pcmd,
-                                             "uid": event.uid, "send": 0, "recv": event.bytes, "port": event.dport, "ip": ip, "domain": domain_dict[ip]}))
+        event_batches[6].append((pid, event.comm.decode(), fd, st_dev, st_ino, exe, cmd,
+                               ppid, event.pcomm.decode(), pfd, pst_dev, pst_ino, pexe, pcmd,
+                               event.uid, 0, event.bytes, event.dport, ip, domain_dict.get(ip, "")))
     def queue_exec_event(cpu, data, size):
         event = b["exec_events"].event(data)
         st_dev, st_ino, pid, fd, exe, cmd = get_fd(event.dev, event.ino, event.pid, -1)
         pst_dev, pst_ino, ppid, pfd, pexe, pcmd = get_fd(event.pdev, event.pino, event.ppid, -1)
         if EVERY_EXE:
-            snitch_pipe_7.send_bytes(pickle.dumps({"pid": pid, "name": event.comm.decode(), "fd": fd, "dev": st_dev, "ino": st_ino, "exe": exe, "cmdline": cmd,
-                                                 "ppid": ppid, "pname": event.pcomm.decode(), "pfd": pfd, "pdev": pst_dev, "pino": pst_ino, "pexe": pexe, "pcmdline": pcmd,
-                                                 "uid": event.uid, "send": 0, "recv": 0, "port": -1, "ip": "", "domain": ""}))
+            event_batches[7].append((pid, event.comm.decode(), fd, st_dev, st_ino, exe, cmd,
+                                   ppid, event.pcomm.decode(), pfd, pst_dev, pst_ino, pexe, pcmd,
+                                   event.uid, 0, 0, -1, "", ""))
     def queue_dns_event(cpu, data, size):
         event = b["dns_events"].event(data)
         if event.daddr:
             ip = socket.inet_ntop(socket.AF_INET, struct.pack("I", event.daddr))
         else:
             ip = socket.inet_ntop(socket.AF_INET6, event.daddr6)
-        domain = event.host.decode("utf-8", "replace")
-        try:
-            _ = ipaddress.ip_address(domain)
-        except ValueError:
-            domain_dict[ip] = ".".join(reversed(domain.split(".")))
+        if domain := reverse_domain_name(event.host.decode("utf-8", "replace")):
+            domain_dict[ip] = domain
+            domain_dict.move_to_end(ip)
+            if len(domain_dict) > PID_CACHE:
+                domain_dict.popitem(last=False)
     b["ipv4_events"].open_perf_buffer(queue_ipv4_event, page_cnt=PAGE_CNT, lost_cb=lambda *args: queue_lost("ipv4", *args))
     b["ipv6_events"].open_perf_buffer(queue_ipv6_event, page_cnt=PAGE_CNT, lost_cb=lambda *args: queue_lost("ipv6", *args))
     b["other_socket_events"].open_perf_buffer(queue_other_event, page_cnt=PAGE_CNT, lost_cb=lambda *args: queue_lost("other", *args))
@@ -1119,6 +1255,7 @@ def monitor_subprocess(config: dict, fan_fd, snitch_pipes, q_error, q_in, _q_out
             return 0
         try:
             b.perf_buffer_poll(timeout=-1)
+            send_event_batches()
         except Exception as e:
             q_error.put("BPF %s%s on line %s" % (type(e).__name__, str(e.args), sys.exc_info()[2].tb_lineno))
 
@@ -1134,11 +1271,16 @@ def virustotal_subprocess(config: dict, q_error, q_vt_pending, q_vt_results):
     if not (config["VT API key"] and vt_enabled):
         config["VT request limit (seconds)"] = 0
     headers = {"x-apikey": config["VT API key"]}
+    if vt_enabled:
+        session = requests.Session()
+        session.headers.update(headers)
+    # results of completed analyses by sha256, so the same file under multiple paths is only queried once
+    vt_cache = {}
     def get_analysis(analysis_id: dict, sha256: str) -> dict:
         api_url = "https://www.virustotal.com/api/v3/analyses/" + analysis_id["data"]["id"]
         for i in range(90):
             time.sleep(max(5, config["VT request limit (seconds)"]))
-            response = requests.get(api_url, headers=headers).json()
+            response = session.get(api_url).json()
             if response["data"]["attributes"]["status"] == "completed":
                 return response["data"]["attributes"]["stats"]
         return {"timeout": api_url, "sha256": sha256}
@@ -1146,13 +1288,16 @@ def virustotal_subprocess(config: dict, q_error, q_vt_pending, q_vt_results):
         if not parent_process.is_alive():
             return 0
         try:
-            time.sleep(config["VT request limit (seconds)"])
             proc, analysis = None, None
-            proc, sha256 = pickle.loads(q_vt_pending.get(block=True, timeout=15))
+            proc, sha256 = q_vt_pending.get(block=True, timeout=15)
+            if sha256 in vt_cache:
+                q_vt_results.put((proc, sha256, *vt_cache[sha256]))
+                continue
+            time.sleep(config["VT request limit (seconds)"])
             suspicious = False
             if config["VT API key"] and vt_enabled:
                 try:
-                    analysis = requests.get("https://www.virustotal.com/api/v3/files/" + sha256, headers=headers).json()
+                    analysis = session.get("https://www.virustotal.com/api/v3/files/" + sha256).json()
                     analysis = analysis["data"]["attributes"]["last_analysis_stats"]
                 except Exception:
                     if config["VT file upload"]:
@@ -1160,33 +1305,31 @@ def virustotal_subprocess(config: dict, q_error, q_vt_pending, q_vt_results):
                             with open(proc["fd"], "rb") as f:
                                 assert (proc["dev"], proc["ino"]) == get_fstat(f.fileno())
                                 files = {"file": (proc["exe"], f)}
-                                analysis_id = requests.post("https://www.virustotal.com/api/v3/files", headers=headers, files=files).json()
+                                analysis_id = session.post("https://www.virustotal.com/api/v3/files", files=files).json()
                             analysis = get_analysis(analysis_id, sha256)
                         except Exception:
                             try:
-                                readlink_exe_sha256 = hashlib.sha256()
-                                with open(proc["exe"], "rb") as f:
-                                    while data := f.read(1048576):
-                                        readlink_exe_sha256.update(data)
-                                assert readlink_exe_sha256.hexdigest() == sha256
+                                with open(proc["exe"], "rb", buffering=0, opener=noatime_opener) as f:
+                                    assert get_sha256_file(f) == sha256
                                 with open(proc["exe"], "rb") as f:
                                     files = {"file": (proc["exe"], f)}
-                                    analysis_id = requests.post("https://www.virustotal.com/api/v3/files", headers=headers, files=files).json()
+                                    analysis_id = session.post("https://www.virustotal.com/api/v3/files", files=files).json()
                                 analysis = get_analysis(analysis_id, sha256)
                             except Exception:
-                                q_vt_results.put(pickle.dumps((proc, sha256, "Failed to read process for upload", suspicious)))
+                                q_vt_results.put((proc, sha256, "Failed to read process for upload", suspicious))
                                 continue
                     else:
                         # could also be an invalid api key
-                        q_vt_results.put(pickle.dumps((proc, sha256, "File not analyzed (analysis not found)", suspicious)))
+                        q_vt_results.put((proc, sha256, "File not analyzed (analysis not found)", suspicious))
                         continue
                 if analysis["suspicious"] != 0 or analysis["malicious"] != 0:
                     suspicious = True
-                q_vt_results.put(pickle.dumps((proc, sha256, str(analysis), suspicious)))
+                vt_cache[sha256] = (str(analysis), suspicious)
+                q_vt_results.put((proc, sha256, str(analysis), suspicious))
             elif vt_enabled:
-                q_vt_results.put(pickle.dumps((proc, sha256, "File not analyzed (no api key)", suspicious)))
+                q_vt_results.put((proc, sha256, "File not analyzed (no api key)", suspicious))
             else:
-                q_vt_results.put(pickle.dumps((proc, sha256, "File not analyzed (requests library not found)", suspicious)))
+                q_vt_results.put((proc, sha256, "File not analyzed (requests library not found)", suspicious))
         except queue.Empty:
             # have to timeout here to check whether to terminate otherwise this could stay hanging
             # daemon=True flag for multiprocessing.Process does not work after root privileges are dropped for parent
@@ -19,9 +19,10 @@ setuptools.setup(
     extras_require={
         "enable_dash": ["dash", "pandas", "plotly"],
         "enable_notifications": ["dbus-python"],
+        "enable_orjson": ["orjson"],
         "enable_sql": ["psycopg", "pymysql"],
         "enable_virustotal": ["requests"],
-        "full": ["dash", "pandas", "plotly", "dbus-python", "psycopg", "pymysql", "requests"]
+        "full": ["dash", "pandas", "plotly", "dbus-python", "orjson", "psycopg", "pymysql", "requests"]
     },
     classifiers=[
         "Operating System :: POSIX :: Linux",